@@ -36,8 +36,8 @@ else:
 tcs3200.cycles=100
 tcs3200.calibrate()
 black_freq = tcs3200.calib(tcs3200.BLACK)
-print("Calibration frequencies for black: ",black_freq)
+print("Calibration frequencies for black (mHz): ",black_freq)
 white_freq = tcs3200.calib(tcs3200.WHITE)
-print("Calibration frequencies for white: ",white_freq)
+print("Calibration frequencies for white (mHz): ",white_freq)
 
 
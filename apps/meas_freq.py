@@ -10,6 +10,7 @@
 # The program is released under the MIT licence
 
 from tcs3200 import TCS3200
+import utime as time
 
 # create an TCS3200 object
 tcs3200 = TCS3200(OUT=19, S2=5, S3=18, S0=17, S1=16, LED=23)
@@ -42,14 +43,14 @@ tcs3200.cycles=100
 while True:
     # Start the measurement
     tcs3200.meas=tcs3200.ON
-    print("cycle: {:d}, no of cycles: {:d}".format(tcs3200._cycle,tcs3200.cycles))
-    while tcs3200._end_tick == 0:
-        time.sleep_ms(10)
-    print("Start time: {:d}".format(tcs3200._start_tick))
-    print("End time: {:d}".format(tcs3200._end_tick))
-    print("No of cycles measured: {:d}".format(tcs3200._cycle))
-    print("Duration: {:d}us".format(tcs3200._end_tick - tcs3200._start_tick))
-    print("Frequency: {:f} Hz".format(tcs3200.measured_freq))
+    print("cycle: {:d}, no of cycles: {:d}".format(tcs3200.cycle,tcs3200.cycles))
+    tcs3200.wait_for_meas()
+    print("Start time: {:d}".format(tcs3200.start_tick))
+    print("End time: {:d}".format(tcs3200.end_tick))
+    print("No of cycles measured: {:d}".format(tcs3200.cycle))
+    print("Duration: {:d}us".format(time.ticks_diff(tcs3200.end_tick,tcs3200.start_tick)))
+    freq = tcs3200.measured_freq # in mHz
+    print("Frequency: {:d}.{:03d} Hz".format(freq//1000,freq%1000))
 
     time.sleep(2)
 
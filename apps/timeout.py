@@ -7,6 +7,8 @@
 # The program is released under the MIT licence
 
 from tcs3200 import TCS3200
+import utime as time
+import sys
 
 # create an TCS3200 object
 tcs3200 = TCS3200(OUT=19, S2=5, S3=18, S0=17, S1=16, LED=23)
@@ -39,19 +41,19 @@ tcs3200.cycles = 100
 for _ in range(2):
     # Start the measurement
     tcs3200.meas=tcs3200.ON
-    print("cycle: {:d}, no of cycles: {:d}".format(tcs3200._cycle,tcs3200.cycles))
+    print("cycle: {:d}, no of cycles: {:d}".format(tcs3200.cycle,tcs3200.cycles))
     try:
-        while tcs3200._end_tick == 0:
-            time.sleep_ms(10)
+        tcs3200.wait_for_meas()
     except Exception as e:
         print(e)
         sys.exit(-1)
 
-    print("Start time: {:d}".format(tcs3200._start_tick))
-    print("End time: {:d}".format(tcs3200._end_tick))
-    print("No of cycles measured: {:d}".format(tcs3200._cycle))
-    print("Duration: {:d}us".format(tcs3200._end_tick - tcs3200._start_tick))
-    print("Frequency: {:f} Hz".format(tcs3200.measured_freq))
+    print("Start time: {:d}".format(tcs3200.start_tick))
+    print("End time: {:d}".format(tcs3200.end_tick))
+    print("No of cycles measured: {:d}".format(tcs3200.cycle))
+    print("Duration: {:d}us".format(time.ticks_diff(tcs3200.end_tick,tcs3200.start_tick)))
+    freq = tcs3200.measured_freq # in mHz
+    print("Frequency: {:d}.{:03d} Hz".format(freq//1000,freq%1000))
     
     time.sleep(2)
     tcs3200.cycles = 10000 # provoke a timeout
@@ -5,12 +5,73 @@
 # University of Cape Coast, Ghana
 # The program is released under the MIT licence
 
-from machine import Pin,Timer
+from machine import Pin
 import utime as time
+import uasyncio as asyncio
+import micropython
+import gc
+from micropython import const
+from array import array
+try:
+    from esp32 import PCNT # hardware pulse counter of the ESP32
+except ImportError:
+    PCNT = None
+try:
+    import rp2 # PIO state machines of the RP2040
+except ImportError:
+    rp2 = None
 
-class TCS3200(object):
+# converts the 4 measured frequencies fv into color components: out = top*(fv-fb)/(fw-fb)
+# span[0..3] hold fw-fb, span[4] holds top. The division is rounded to the nearest integer,
+# such that fv == fw gives exactly top, and the result is clamped to 0..top without branches.
+# The arithmetic is 32 bit: top must not exceed _NORM_MAX_TOP and the frequencies (in mHz) _NORM_MAX_FREQ
+_NORM_MAX_TOP  = const(255)
+_NORM_MAX_FREQ = const(0x7fffff)
+
+@micropython.viper
+def _rgb_norm(fv:ptr32,fb:ptr32,span:ptr32,out:ptr32):
+    top = span[4]
+    for i in range(4):
+        sp = span[i]
+        comp = (top*(fv[i] - fb[i]) + (sp >> 1)) // sp
+        comp = comp - (comp & (comp >> 31)) # negative values become 0
+        diff = top - comp
+        out[i] = comp + (diff & (diff >> 31)) # values above top become top
+
+ticks_us = time.ticks_us # module level reference, bound into the interrupt handler
+
+if rp2:
+    # PIO program counting the OUT cycles in hardware. It raises an interrupt on the first
+    # rising edge and another one n+1 cycles later, where n is read from the TX FIFO.
+    # Both interrupts use the same flag: the start interrupt blocks until it has been
+    # handled, such that a short window cannot merge the end into a still pending start
+    @rp2.asm_pio()
+    def _pio_cycles():
+        pull(block)
+        mov(x,osr)
+        wait(0,pin,0)
+        wait(1,pin,0)
+        irq(block,rel(0))   # start of the measurement
+        label("count")
+        wait(0,pin,0)
+        wait(1,pin,0)
+        jmp(x_dec,"count")
+        irq(rel(0))         # end of the measurement
+
+# indices into the measurement state array shared with the interrupt handler
+_CYCLE      = const(0) # no of OUT cycles seen so far
+_CYCLES     = const(1) # no of OUT cycles for which the time is measured
+_START_TICK = const(2)
+_END_TICK   = const(3)
+_FILTER     = const(4) # index of the current filter in the scan
+_NFILTERS   = const(5) # no of filters to be scanned
+_TIMEOUT    = const(6) # timeout per filter in us
+
+class TCS3200Base(object):
     """
     This class reads RGB values from a TCS3200 colour sensor.
+    It contains no debugging output, see TCS3200Debug for a version printing
+    what the driver is doing.
 
     GND   Ground.
     VDD   Supply Voltage (2.7-5.5V)
@@ -47,36 +108,62 @@ class TCS3200(object):
     ON  = True  # on for debugging and the leds
     OFF = False # off
 
-    RED   = (0,0) # S2 and S3 low
-    BLUE  = (0,1) # S2 low, S3 high
-    GREEN = (1,1) # S2 and S3 high
-    CLEAR = (1,0) # S2 high and S3 low
+    # the filter settings are coded as (S2<<1)|S3
+    RED   = 0b00 # S2 and S3 low
+    BLUE  = 0b01 # S2 low, S3 high
+    GREEN = 0b11 # S2 and S3 high
+    CLEAR = 0b10 # S2 high and S3 low
 
     RED_COMP   = 0 # the color components
     GREEN_COMP = 1
     BLUE_COMP  = 2
     CLEAR_COMP = 3
     
-    POWER_OFF       = (0,0) # S0 and S1 low
-    TWO_PERCENT     = (0,1) # S0 low, S1 high
-    TWENTY_PERCENT  = (1,0) # S0 high, S1 low
-    HUNDRED_PERCENT = (1,1) # S0 and S1 high
+    # the frequency divider settings are coded as (S0<<1)|S1
+    POWER_OFF       = 0b00 # S0 and S1 low
+    TWO_PERCENT     = 0b01 # S0 low, S1 high
+    TWENTY_PERCENT  = 0b10 # S0 high, S1 low
+    HUNDRED_PERCENT = 0b11 # S0 and S1 high
 
     WHITE = True
     BLACK = False
     
-    def __init__(self, OUT=19, S2=5, S3=18, S0=None, S1=None, LED=None,OE=None):
+    def __init__(self, OUT=19, S2=5, S3=18, S0=None, S1=None, LED=None,OE=None,counter=0):
         """
         The gpios connected to the sensor OUT, S2, and S3 pins must
         be specified.  The S0, S1 (frequency) and LED and OE (output enable) 
         gpios are optional.
         The OE pin is missing on some TCS3200 boards
+        counter is the number of the PCNT unit (ESP32) or of the PIO state machine (RP2040)
+        counting the OUT cycles. Each sensor object needs its own counter
         """
         
         self._OUT = Pin(OUT,Pin.IN,Pin.PULL_UP)
+        self._outv = self._OUT.value
+
+        # On the ESP32 the rising edges of OUT are counted by the PCNT pulse counter, which
+        # interrupts only twice per measurement: on the first edge (match0) and once the
+        # requested number of cycles has passed (match1). On the RP2040 a PIO state machine
+        # does the same. Everywhere else each edge triggers the _cbf interrupt handler.
+        # The PCNT callback is scheduled, not a hard interrupt: both ticks include the scheduler
+        # latency, which may reach milliseconds while Python code is running. Measure enough
+        # cycles for the duration to be large compared to this latency.
+        # The ESP32 RMT peripheral cannot be used to time the pulses instead: MicroPython's
+        # esp32.RMT class only supports transmitting pulses, there is no receive mode
+        self._pcnt = None
+        if PCNT :
+            self._pcnt = PCNT(counter,pin=self._OUT,rising=PCNT.INCREMENT,match0=1)
+            self._pcnt.stop()
+            self._pcnt.irq(handler=self._pcnt_cbf,trigger=PCNT.IRQ_MATCH0|PCNT.IRQ_MATCH1)
+        self._sm = None
+        if rp2 :
+            self._sm = rp2.StateMachine(counter,_pio_cycles,in_base=self._OUT)
+            self._sm.irq(self._pio_cbf,hard=True)
         
         self._S2 = Pin(S2,Pin.OUT)
         self._S3 = Pin(S3,Pin.OUT)
+        self._s2v = self._S2.value # bound methods, saves the attribute lookups
+        self._s3v = self._S3.value
         
         self._S0  = S0
         self._S1  = S1
@@ -84,182 +171,266 @@ class TCS3200(object):
         self._LED = LED
         
         
+        # Whether S0/S1, LED and OE are connected is known here: the accessors used by the
+        # freq_divider, led and output_enable properties are chosen once instead of
+        # checking the pins on every call
         if S0 and S1 :
             self._S0 = Pin(S0,Pin.OUT)
             self._S1 = Pin(S1,Pin.OUT)
+            s0v = self._s0v = self._S0.value
+            s1v = self._s1v = self._S1.value
+            def get_divider():
+                return (s0v()<<1) | s1v()
+            def set_divider(freq_div):
+                s0v((freq_div>>1)&1)
+                s1v(freq_div&1)
+        else:
+            def get_divider():
+                print("S0 or S1 signal is not connected. The frequency divider is therefore fixed")
+            def set_divider(freq_div):
+                print("S0 or S1 signal is not connected. The frequency divider is therefore fixed and cannot be set")
+        self._get_divider = get_divider
+        self._set_divider = set_divider
             
         if LED :
             self._LED = Pin(LED,Pin.OUT)
             self._LED.on()
+            self._get_led = self._LED.value
+            self._set_led = self._LED.value
+        else:
+            self._get_led = lambda: print("The LED signal is not connected")
+            self._set_led = lambda onOff: print("The LED signal is not connected. The LEDs cannot be switched")
                 
         if OE :
             self._OE =  Pin(OE,Pin.OUT)
+            self._OE.off() # OE is active low: enable the output
+            oev = self._OE.value
+            self._get_oe = lambda: not oev()
+            self._set_oe = lambda onOff: oev(not onOff)
+        else:
+            # OE is tied to GND, the output is always enabled
+            self._get_oe = lambda: True
+            self._set_oe = lambda onOff: print("The OE signal is not connected. The output is always enabled")
 
-        self._tim = Timer(0) # timer generating a timeout if the measurement takes to long
-        self._timeout = 5000   # timeout in ms
-        
-        self._debug = self.OFF
-        self._cycles = 100    # the number of cycles of the out signal for which the time is measured
-        self._cycle = 0
+        # the measurement state is kept in a single int array which the interrupt handler
+        # can access without allocating memory
+        self._state = array('i',[0]*7)
+        self.timeout = 5000   # timeout in ms
+        self._set_cycles(100) # the number of cycles of the out signal for which the time is measured
+        # filter sequence of a scan and the measured durations for each filter
+        self._filters = bytes((self.RED,self.GREEN,self.BLUE,self.CLEAR))
+        self._durations = array('i',[0]*4)
         self._freq_div = self.POWER_OFF
-        self._start_tick = 0
-        self._end_tick = 0
+        self._done = asyncio.ThreadSafeFlag() # set by the interrupt handler once the measurement is finished
+        self._meas = False
+        self._gc_enabled = True # state of the garbage collector before the measurement was started
         meas_finished = False
-        # variables containing the calibration
-        self._freq_black = [None]*4
-        self._freq_white = [None]*4
+        # the measured frequencies and the calibration are kept in preallocated arrays
+        # which are filled in place, such that a readout does not allocate memory
+        self._freqs = array('i',[0]*4)
+        self._freq_black = array('i',[0]*4)
+        self._freq_white = array('i',[0]*4)
         self._max_comp=255
+        self._span = array('i',[1,1,1,1,self._max_comp]) # Fw-Fb and max_comp, see _rgb_norm
+        self._rgb_out = array('i',[0]*4)
+        self._calc_span()
         
-    @property
-    def debugging(self) :
-        return self._debug
-        
-    @debugging.setter
-    def debugging(self,onOff) :
-        if onOff:
-            print("Debugging switched on")
-        else :
-            print("Debugging switched off")
-        self._debug = onOff
-
     # controls the illumination LEDs
     @property
     def led(self):
         # get the current state of the illumination leds
-        return self._LED.value()
+        return self._get_led()
     
     @led.setter
     def led(self,onOff):
-        if onOff:
-            self._LED.on()
-        else:
-            self._LED.off()
+        self._set_led(onOff)
+
+    # enables or disables the OUT signal
+    @property
+    def output_enable(self):
+        return self._get_oe()
+
+    @output_enable.setter
+    def output_enable(self,onOff):
+        self._set_oe(onOff)
             
     # sets the filters
     @property
     def filter(self):
-        current_setting = (self._S2.value(),self._S3.value())
-        if self._debug:
-            if current_setting == self.RED:
-                print("Red filter is set")
-            elif current_setting == self.GREEN:
-                print("Green filter is set")
-            elif current_setting == self.BLUE :
-                print("Blue filter is set")
-            else:
-                print("No filters are set. The filter setting is clear")
-        return current_setting      
+        return (self._s2v()<<1) | self._s3v()
     
     @filter.setter
     def filter(self,filter_setting):
-        if self._debug:
-            print("Setting S2 to {:d} and S3 to {:d}".format(filter_setting[0],filter_setting[1]))
-        self._S2.value(filter_setting[0])
-        self._S3.value(filter_setting[1])
+        self._s2v((filter_setting>>1)&1)
+        self._s3v(filter_setting&1)
 
     @property
     def freq_divider(self):
-        if not self._S0 or not self._S1:
-            print("S0 or S1 signal is not connected. The frequency divider is therefore fixed")
-            return
-        current_freq_div = (self._S0.value(),self._S1.value())
-        if self._debug:
-            if current_freq_div == self.POWER_OFF:
-                print("Device set to sleep mode")
-            elif current_freq_div == self.TWO_PERCENT:
-                print("Frequency divided by a factor 50")
-            elif current_freq_div == self.TWENTY_PERCENT:
-                print("Frequency divided by a factor 5")
-            else:
-                print("Frequency at 100%")
-
-        return current_freq_div
+        return self._get_divider()
     
     @freq_divider.setter
     def freq_divider(self,freq_div):
-        if not self._S0 or not self._S1:
-            print("S0 or S1 signal is not connected. The frequency divider is therefore fixed and cannot be set")
-            return
-        
-        if self._debug:
-            print("Setting S0 to {:d} and S1 to {:d}".format(freq_div[0],freq_div[1]))
-        self._S0.value(freq_div[0])
-        self._S1.value(freq_div[1])
+        self._set_divider(freq_div)
 
     def power_off(self):
         self.freq_divider = self.POWER_OFF
         
     @property
     def cycles(self):
-        return self._cycles
+        return self._state[_CYCLES]
 
     @cycles.setter
     def cycles(self,no_of_cycles):
+        self._set_cycles(no_of_cycles)
+
+    # returns True if the no of cycles was accepted
+    def _set_cycles(self,no_of_cycles):
         if no_of_cycles < 1:
             print("The number of cycles must be at least 1")
-            return
-        self._cycles = no_of_cycles
-        if self._debug:
-            print("No of cycles to be measured was set to {:d}".format(self._cycles))
+            return False
+        if self._pcnt and no_of_cycles >= 32767:
+            print("The pulse counter cannot count more than 32766 cycles")
+            return False
+        self._state[_CYCLES] = no_of_cycles
+        # frequency in mHz = scale/duration, duration is measured in us. Integer mHz keep the
+        # fractions of a Hz measured at the 2% divider without using floats
+        self._scale = no_of_cycles * 1000000000
+        return True
+
+    @property
+    # the number of OUT cycles seen by the running or last measurement
+    def cycle(self):
+        return self._state[_CYCLE]
+
+    @property
+    def start_tick(self):
+        return self._state[_START_TICK]
+
+    @property
+    def end_tick(self):
+        return self._state[_END_TICK]
 
     @property
     def meas(self):
-        if self._debug:
-            if self._meas:
-                print("Measurement is started")
-            else:
-                print("Measurement is stopped")
         return self._meas
     
     @meas.setter
     def meas(self,startStop):
         if startStop:
-            self._meas = True
-            self._cycle = 0
-            self._start_tick = 0
-            self._end_tick = 0
-            if self._debug:
-                print("Measurement handler started")
-            self._OUT.irq(trigger=Pin.IRQ_RISING,handler=self._cbf)
-            # start the timeout counter
-            self._tim.init(period=self._timeout, mode=Timer.ONE_SHOT, callback=self._timeout_handler)
+            self._start(1)
+        else:
+            self._stop()
+
+    # starts a measurement on the currently set filter followed by nfilters-1 further
+    # filters from the scan sequence. The interrupt handlers switch the filters
+    def _start(self,nfilters):
+        # a garbage collection while measuring would delay the interrupt handlers
+        # The garbage is collected before disabling the collector: no collection is done
+        # while it is disabled and the allocations until the end of the measurement
+        # (the wait, the event loop) would otherwise fail with MemoryError on a full heap.
+        # If a measurement is already running, the collector is already disabled by it
+        if not self._meas:
+            self._gc_enabled = gc.isenabled()
+            gc.collect()
+        gc.disable()
+        self._meas = True
+        self._state[_CYCLE] = 0
+        self._state[_START_TICK] = 0
+        self._state[_END_TICK] = 0
+        self._state[_FILTER] = 0
+        self._state[_NFILTERS] = nfilters
+        self._done.clear()
+        if self._pcnt:
+            # the end of the measurement is _CYCLES edges after the first one
+            self._pcnt.init(match1=self._state[_CYCLES]+1)
+            self._pcnt.value(0)
+            self._pcnt.start()
+        elif self._sm:
+            self._sm.restart()
+            self._sm.active(1)
+            self._sm.put(self._state[_CYCLES]-1)
+        else:
+            self._OUT.irq(trigger=Pin.IRQ_RISING,handler=self._cbf,hard=True)
+
+    def _stop(self):
+        if self._meas and self._gc_enabled:
+            gc.enable()
+        self._meas=False
+        if self._pcnt:
+            self._pcnt.stop()
+        elif self._sm:
+            self._sm.active(0)
         else:
-            self._meas=False
             self._OUT.irq(trigger=Pin.IRQ_RISING,handler=None)
-            if self._debug:
-                print("Measurement handler stopped")
-            # disarm the timeout
-            self._tim.deinit()
+
+    # the wait for the end of a measurement on nfilters filters. It is created before
+    # the measurement is started, while the garbage collector is still enabled
+    def _wait_done(self,nfilters):
+        return asyncio.wait_for_ms(self._done.wait(),self._timeout*nfilters)
+
+    # waits until the running measurement is finished and stops it
+    # asyncio.TimeoutError is raised if the measurement takes too long. This is detected
+    # either by the interrupt handler or, if no edges are seen at all, by the wait itself
+    async def wait_for_meas_async(self):
+        await self._finish(self._wait_done(self._state[_NFILTERS]))
+
+    async def _finish(self,wait_done):
+        try:
+            await wait_done
+        finally:
+            self.meas = self.OFF # also re-enables the garbage collector if the wait is cancelled
+        if self._state[_END_TICK] < 0:
+            raise asyncio.TimeoutError("Measurement Timeout!")
+
+    # synchronous version of wait_for_meas_async for callers not running an event loop
+    def wait_for_meas(self):
+        asyncio.run(self.wait_for_meas_async())
             
+    # the frequencies in mHz measured on the black or white target by calibrate
     def calib(self,black_or_white):
         if black_or_white == self.BLACK:
             return self._freq_black
         else:
             return self._freq_white
 
-    @property
-    # measure the frequencies for the 3 rgb color componenent and for the clear filter
-    def meas_freqs(self):
-        filter_settings = (self.RED,self.GREEN,self.BLUE,self.CLEAR)
-        freqs = [None]*4
+    # measure the frequencies in mHz for the 3 rgb color componenent and for the clear filter
+    # All 4 filters are measured in a single scan, the interrupt handlers switch from one filter to the next
+    # The frequencies are written into the same array on each call
+    async def meas_freqs_async(self):
+        freqs = self._freqs
 
+        self.filter = self._filters[0]
+        nfilters = len(self._filters)
+        wait_done = self._wait_done(nfilters)
+        self._start(nfilters)  # start the scan
+        await self._finish(wait_done)
         for i in range(self.CLEAR_COMP+1):
-            # set the filter
-            self.filter = filter_settings[i]
-            self.meas = self.ON       # start the measurement
-            while self._end_tick == 0:
-                time.sleep_ms(10)
-            freqs[i] = self.measured_freq
+            freqs[i] = self._scale // self._durations[i]
             
         return freqs
+
+    @property
+    # synchronous version of meas_freqs_async
+    def meas_freqs(self):
+        return asyncio.run(self.meas_freqs_async())
     
     def calibrate(self):
         print("Calibrating black object, press enter to start",end='')
         self.wait_for_return()
-        self._freq_black = self.meas_freqs
+        self._freq_black[:] = self.meas_freqs
         print("Calibrating white object, press enter to start",end='')
         self.wait_for_return()
-        self._freq_white = self.meas_freqs
+        self._freq_white[:] = self.meas_freqs
+        self._calc_span()
+
+    # Fw-Fb does not change after calibration: compute it once
+    # The viper kernel is only used if its 32 bit arithmetic cannot overflow
+    def _calc_span(self):
+        for i in range(4):
+            self._span[i] = max(1,self._freq_white[i] - self._freq_black[i])
+        self._span[4] = self._max_comp
+        self._use_kernel = (self._max_comp <= _NORM_MAX_TOP and
+                            max(self._freq_black) <= _NORM_MAX_FREQ)
         
     def wait_for_return(self):
         dummy = input()
@@ -271,15 +442,27 @@ class TCS3200(object):
     @timeout.setter
     def timeout(self,timeout_ms):
         self._timeout = timeout_ms
+        self._state[_TIMEOUT] = timeout_ms * 1000
     
     @property
+    # the frequency in mHz measured on the last filter, truncated to whole mHz
+    # None if the measurement has not finished or timed out
     def measured_freq(self):
-        duration = self._end_tick - self._start_tick  # measurement duration
-        frequency = 1000000 * self._cycles/duration   # duration is measured in us
-        return frequency
+        if self._state[_END_TICK] <= 0:
+            return None
+        duration = time.ticks_diff(self._state[_END_TICK],self._state[_START_TICK]) # measurement duration
+        if duration <= 0:
+            return None
+        return self._scale // duration
     
+    # calculates the color component comp from the frequency freq in mHz, as done by rgb:
+    # max_comp*(Fv-Fb)/(Fw-Fb) rounded to the nearest integer and clamped to 0..max_comp
+    # Python integers are used, which cannot overflow
     def calc_rgb_comp(self,comp,freq):
-        return  (freq - self._freq_black[comp]) / (self._freq_white[comp] - self._freq_black[comp])
+        top = self._max_comp
+        span = self._span[comp]
+        value = (top*(freq - self._freq_black[comp]) + (span>>1)) // span
+        return max(0,min(top,value))
 
     @property
     # gets the maximum value for a color component
@@ -288,60 +471,236 @@ class TCS3200(object):
     
     @max_comp.setter
     # sets the maximum value for a color component
+    # The components are integers: the maximum must be an int fitting into 31 bits
     def max_comp(self,value):
+        if not isinstance(value,int) or value < 1 or value > 0x7fffffff:
+            print("The maximum of a color component must be an integer from 1 to 0x7fffffff")
+            return
         self._max_comp = value
+        self._calc_span()
         
     @property
     # Measure the rgb values as well as the intensity value (no filter)
+    # The values are written into the same int array on each call: copy it to keep them
     def rgb(self):
         if not self._freq_black[0] or not  self._freq_white[0]:
             print("Missing calibration. Please calibrate the device before attempting to measure colored targets")
             return
 
-        freqs = self.meas_freqs
-        if self._debug:
-            print("Measured Frequencies: red: {:f}, green: {:f}, blue: {:f}, intensity: {:f}".format(
-                freqs[0],freqs[1],freqs[2],freqs[3]))
-        argb = [None]*4
+        return self._rgb_comps(self.meas_freqs)
+
+
+    # calculates max_comp*(Fv-Fb)/(Fw-Fb) for all components, with a single viper call if possible
+    # The result is written into the same array on each call
+    def _rgb_comps(self,freqs):
+        out = self._rgb_out
+        if self._use_kernel and max(freqs) <= _NORM_MAX_FREQ:
+            _rgb_norm(freqs,self._freq_black,self._span,out)
+            return out
         for i in range(4):
-            argb[i]=int(self._max_comp*self.calc_rgb_comp(i,freqs[i]))
-            if argb[i] < 0:
-                argb[i] = 0
-        if self._debug:
-            print("rgb array:",argb)
-        return argb
-                        
+            out[i] = self.calc_rgb_comp(i,freqs[i])
+        return out
         
     # This is the callback function that measures the time taken by a predefined no of cycles of the out signal
-    def _cbf(self,src):
-        t = time.ticks_us()
-        if self._cycle == 0:
-            self._start_tick = t
-        if self._cycle >= self._cycles: # the number of cycles has been reached
-            self._end_tick = t
-            self.meas=self.OFF
+    # It runs as a hard interrupt handler: it must not allocate memory nor call any property setters.
+    # It is compiled to machine code and works on the _state array only.
+    # ticks_us is bound as a default argument, which makes it a cheap local lookup
+    # If a filter takes longer than the timeout, the end tick is set to -1 and the measurement stopped
+    @micropython.native
+    def _cbf(self,src,_ticks=ticks_us,_ticks_diff=time.ticks_diff):
+        t = _ticks()
+        state = self._state
+        if state[_END_TICK]: # the measurement is finished or has timed out
             return
-        self._cycle += 1
-        
-    # The timeout handler raises a timeout exception
-    def _timeout_handler(self,src):
-        # stop the measurement
-        self._OUT.irq(trigger=Pin.IRQ_RISING,handler=None)
-        # raise the timeour exception
-        raise Exception("Measurement Timeout!")
-    
-    # callback to stop data taking 
-    def setStopFlag(self,t):
-        self.stopFlag=True
-        
+        cycle = state[_CYCLE]
+        if cycle == 0:
+            state[_START_TICK] = t
+        elif _ticks_diff(t,state[_START_TICK]) > state[_TIMEOUT]:
+            state[_END_TICK] = -1
+            src.irq(handler=None)
+            self._done.set()
+            return
+        if cycle < state[_CYCLES]:
+            state[_CYCLE] = cycle + 1
+        else: # the number of cycles has been reached
+            self._next_filter(t)
+            if state[_END_TICK]:
+                src.irq(handler=None) # end of the scan, switch the interrupt off directly
+
+    # Called from the interrupt handlers once the predefined no of cycles has been measured on the
+    # current filter. It saves the duration and switches to the next filter of the scan or,
+    # if the scan is complete, signals the end of the measurement
+    @micropython.native
+    def _next_filter(self,t,_ticks_diff=time.ticks_diff):
+        state = self._state
+        i = state[_FILTER]
+        self._durations[i] = _ticks_diff(t,state[_START_TICK])
+        i += 1
+        state[_FILTER] = i
+        if i < state[_NFILTERS]:
+            f = self._filters[i]
+            self._s2v(f>>1)
+            self._s3v(f&1)
+            state[_CYCLE] = 0
+        else:
+            state[_END_TICK] = t
+            self._done.set()
+
+    # This is the interrupt handler of the pulse counter. It is called on the first rising edge
+    # of the out signal and once the predefined no of cycles have passed.
+    # It runs from the scheduler: a callback still pending when the measurement was stopped
+    # is ignored. If the start tick could not be taken before the cycles had passed, the
+    # measurement of the current filter is restarted
+    def _pcnt_cbf(self,pcnt,_ticks=ticks_us):
+        t = _ticks()
+        state = self._state
+        flags = pcnt.irq().flags()
+        if not self._meas or state[_END_TICK]: # stopped, finished or timed out
+            return
+        if (flags & PCNT.IRQ_MATCH1) and ((flags & PCNT.IRQ_MATCH0) or
+                                          time.ticks_diff(t,state[_START_TICK]) <= 0):
+            state[_CYCLE] = 0
+            pcnt.value(0)
+            return
+        if flags & PCNT.IRQ_MATCH0:
+            state[_START_TICK] = t
+        if flags & PCNT.IRQ_MATCH1:
+            state[_CYCLE] = state[_CYCLES]
+            self._next_filter(t)
+            if state[_END_TICK] == 0:
+                pcnt.value(0) # restart counting for the next filter
+            else:
+                pcnt.stop()
+
+    # This is the interrupt handler of the PIO state machine. It is called on the first rising edge
+    # of the out signal and once the predefined no of cycles have passed
+    @micropython.native
+    def _pio_cbf(self,sm,_ticks=ticks_us):
+        t = _ticks()
+        state = self._state
+        if state[_END_TICK]:
+            return
+        if state[_CYCLE] == 0:
+            state[_START_TICK] = t
+            state[_CYCLE] = 1
+            return
+        state[_CYCLE] = state[_CYCLES]
+        self._next_filter(t)
+        if state[_END_TICK] == 0:
+            sm.put(state[_CYCLES]-1) # start counting on the next filter
+        else:
+            sm.active(0)
+
     # This is a test function that reads the OUT signal for 100 ms at a sampling frequency of 10 samples per ms
     # It prints the current state of the OUT signal such that you can plot the signal
     def testOut(self):
         self.values = []
-        self.stopFlag = False
-        # start a timer for 100 ms
-        self._tim.init(period=100, mode=Timer.ONE_SHOT, callback=self.setStopFlag)
-        while not self.stopFlag:
-            self.values.append(self._OUT.value())
+        start = time.ticks_ms()
+        while time.ticks_diff(time.ticks_ms(),start) < 100:
+            self.values.append(self._outv())
             time.sleep_us(100)
         return self.values
+
+class TCS3200Debug(TCS3200Base):
+    """
+    TCS3200 driver printing what it is doing when debugging is switched on.
+    The debugging output is kept out of TCS3200Base, such that the measurement
+    code of the base class does not have to check for it.
+    """
+    def __init__(self, OUT=19, S2=5, S3=18, S0=None, S1=None, LED=None,OE=None,counter=0):
+        super().__init__(OUT,S2,S3,S0,S1,LED,OE,counter)
+        self._debug = self.OFF
+
+    @property
+    def debugging(self) :
+        return self._debug
+        
+    @debugging.setter
+    def debugging(self,onOff) :
+        if onOff:
+            print("Debugging switched on")
+        else :
+            print("Debugging switched off")
+        self._debug = onOff
+
+    @property
+    def filter(self):
+        current_setting = (self._s2v()<<1) | self._s3v()
+        if self._debug:
+            if current_setting == self.RED:
+                print("Red filter is set")
+            elif current_setting == self.GREEN:
+                print("Green filter is set")
+            elif current_setting == self.BLUE :
+                print("Blue filter is set")
+            else:
+                print("No filters are set. The filter setting is clear")
+        return current_setting      
+    
+    @filter.setter
+    def filter(self,filter_setting):
+        if self._debug:
+            print("Setting S2 to {:d} and S3 to {:d}".format(filter_setting>>1,filter_setting&1))
+        self._s2v((filter_setting>>1)&1)
+        self._s3v(filter_setting&1)
+
+    @property
+    def freq_divider(self):
+        current_freq_div = self._get_divider()
+        if current_freq_div is None: # S0 or S1 not connected
+            return
+        if self._debug:
+            if current_freq_div == self.POWER_OFF:
+                print("Device set to sleep mode")
+            elif current_freq_div == self.TWO_PERCENT:
+                print("Frequency divided by a factor 50")
+            elif current_freq_div == self.TWENTY_PERCENT:
+                print("Frequency divided by a factor 5")
+            else:
+                print("Frequency at 100%")
+
+        return current_freq_div
+    
+    @freq_divider.setter
+    def freq_divider(self,freq_div):
+        if self._debug and self._S0 and self._S1:
+            print("Setting S0 to {:d} and S1 to {:d}".format(freq_div>>1,freq_div&1))
+        self._set_divider(freq_div)
+
+    # the getter of cycles and the setter of meas are the ones of the base class
+    @TCS3200Base.cycles.setter
+    def cycles(self,no_of_cycles):
+        if self._set_cycles(no_of_cycles) and self._debug:
+            print("No of cycles to be measured was set to {:d}".format(no_of_cycles))
+
+    @TCS3200Base.meas.getter
+    def meas(self):
+        if self._debug:
+            if self._meas:
+                print("Measurement is started")
+            else:
+                print("Measurement is stopped")
+        return self._meas
+
+    def _start(self,nfilters):
+        if self._debug:
+            print("Measurement handler started")
+        TCS3200Base._start(self,nfilters)
+
+    def _stop(self):
+        TCS3200Base._stop(self)
+        if self._debug:
+            print("Measurement handler stopped")
+
+    # prints the frequencies measured by rgb and the resulting color components
+    def _rgb_comps(self,freqs):
+        if self._debug:
+            print("Measured Frequencies (mHz): red: {:d}, green: {:d}, blue: {:d}, intensity: {:d}".format(
+                freqs[0],freqs[1],freqs[2],freqs[3]))
+        argb = TCS3200Base._rgb_comps(self,freqs)
+        if self._debug:
+            print("rgb array:",argb)
+        return argb
+
+# the default driver class is the one supporting debugging output
+TCS3200 = TCS3200Debug